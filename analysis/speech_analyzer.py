@@ -1,4 +1,5 @@
 import re
+from difflib import SequenceMatcher
 import numpy as np
 from utils.logger import setup_logger
 from analysis.pronunciation_analyzer import PronunciationAnalyzer
@@ -265,8 +266,6 @@ class SpeechAnalyzer:
         # If we have the original prompt, compare the structure and content
         if original_prompt:
             # Use a more forgiving comparison that accounts for natural variations when reading
-            from difflib import SequenceMatcher
-
             # Calculate similarity ratio between original and transcription
             similarity = SequenceMatcher(None, original_prompt.lower(), text.lower()).ratio()
 
@@ -370,8 +369,6 @@ class SpeechAnalyzer:
         # If we have the original prompt, compare the transcription to it for articulation
         if original_prompt:
             # Use a more forgiving comparison that accounts for natural variations when reading
-            from difflib import SequenceMatcher
-
             # Calculate similarity ratio between original and transcription
             similarity = SequenceMatcher(None, original_prompt.lower(), text.lower()).ratio()
 
@@ -413,14 +410,10 @@ class SpeechAnalyzer:
         """
         Analyze speaking pace based on pauses and rhythm
         """
-        import re
-
         # If we have the original prompt, compare the transcription to it for pace
         if original_prompt:
             # Use a more forgiving approach that considers how much of the text was read
             # rather than focusing on sentence structure
-            from difflib import SequenceMatcher
-
             # Calculate similarity ratio between original and transcription
             similarity = SequenceMatcher(None, original_prompt.lower(), text.lower()).ratio()
 
@@ -458,7 +451,6 @@ class SpeechAnalyzer:
                 return 0
 
             # Calculate standard deviation as a measure of pace consistency
-            import numpy as np
             std_dev = np.std(word_counts) if len(word_counts) > 1 else 0
 
             # Lower std deviation = more consistent pace = higher score
@@ -476,8 +468,6 @@ class SpeechAnalyzer:
 
         # If we have the original prompt, compare the transcription to it
         if original_prompt:
-            from difflib import SequenceMatcher
-
             # Calculate similarity ratio between original and transcription
             similarity = SequenceMatcher(None, original_prompt.lower(), text.lower()).ratio()
 
@@ -25,34 +25,8 @@ class DeepgramClientWrapper:
         :param audio_data: Audio data as bytes
         :return: Transcribed text
         """
-        try:
-            # The audio data from PyAudio needs to be wrapped in a proper WAV format
-            # Create a WAV file in memory with the proper headers
-            wav_buffer = io.BytesIO()
-            with wave.open(wav_buffer, 'wb') as wav_file:
-                # Configure for the same format as the microphone handler
-                wav_file.setnchannels(1)  # Mono
-                wav_file.setsampwidth(2)  # 16-bit (2 bytes)
-                wav_file.setframerate(44100)  # 44.1kHz
-                wav_file.writeframes(audio_data)
-
-            # Get the WAV formatted bytes
-            wav_bytes = wav_buffer.getvalue()
-
-            # Call the Deepgram API using the correct method for WAV audio data
-            response = self.client.listen.v1.media.transcribe_file(
-                request=wav_bytes,
-                model="nova-2",
-                language="en-US",
-                punctuate=True,
-            )
-
-            # Extract transcript from response
-            transcript = response.results.channels[0].alternatives[0].transcript
-            return transcript
-        except Exception as e:
-            logger.error(f"Error transcribing audio: {str(e)}")
-            raise
+        # PyAudio captures 16-bit mono at 44.1kHz; share the WAV-wrapping path with ESP32 audio
+        return await self.transcribe_audio_from_bytes(audio_data, sample_rate=44100, channels=1, sample_width=2)
 
     async def transcribe_audio_from_bytes(self, audio_bytes, sample_rate=44100, channels=2, sample_width=2):
         """
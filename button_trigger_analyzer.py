@@ -6,12 +6,14 @@ Press once to start, press again to stop
 """
 
 import asyncio
+import json
 import socket
 import wave
 import os
 import sys
 import time
 import subprocess
+import urllib.request
 from datetime import datetime
 from dotenv import load_dotenv
 
@@ -30,6 +32,35 @@ AUDIO_PORT = 1234
 PROMPT_PORT = 1235
 PLAYBACK_PORT = 1236
 
+# ESP32 I2S audio format (44.1kHz, stereo, 16-bit)
+SAMPLE_RATE = 44100
+CHANNELS = 2
+SAMPLE_WIDTH = 2
+BYTES_PER_SECOND = SAMPLE_RATE * CHANNELS * SAMPLE_WIDTH
+
+# Kernel receive buffer for the audio socket (~6s of audio) to absorb WiFi bursts
+AUDIO_RCVBUF_BYTES = 1024 * 1024
+
+# Upper bound on a single recording so a lost STOP message can't grow the buffer forever
+MAX_RECORDING_SECONDS = 300
+MAX_RECORDING_BYTES = MAX_RECORDING_SECONDS * BYTES_PER_SECOND
+
+# Improvement tips in display priority order: (aspect, tip if score < 4, tip if score < 7)
+IMPROVEMENT_TIPS = (
+    ('pronunciation',
+     "pronunciation needs work - slow down and articulate each word",
+     "practice difficult words and focus on ending sounds"),
+    ('articulation',
+     "open your mouth more and exaggerate mouth movements",
+     "work on consonant clarity - don't mumble word endings"),
+    ('pace',
+     "speak more steadily - avoid rushing through sentences",
+     "use pauses between phrases - don't rush"),
+    ('clarity',
+     "speak louder and closer to the microphone",
+     "project your voice and reduce filler words"),
+)
+
 class ButtonTriggerAnalyzer:
     def __init__(self):
         self.esp32_ip = ESP32_IP
@@ -48,10 +79,18 @@ class ButtonTriggerAnalyzer:
         # Create sockets
         self.audio_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.audio_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.audio_sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, AUDIO_RCVBUF_BYTES)
         self.audio_sock.bind(("0.0.0.0", self.audio_port))
+        rcvbuf = self.audio_sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+        if sys.platform.startswith("linux"):
+            rcvbuf //= 2  # Linux reports double the granted size to cover bookkeeping
+        if rcvbuf < AUDIO_RCVBUF_BYTES:
+            print(f"Warning: audio receive buffer limited to {rcvbuf // 1024} KB "
+                  f"(raise net.core.rmem_max to allow {AUDIO_RCVBUF_BYTES // 1024} KB)")
 
         self.prompt_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.prompt_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.prompt_addr = (self.esp32_ip, self.prompt_port)
         
         # Initialize clients
         api_key = os.getenv('DEEPGRAM_API_KEY')
@@ -76,7 +115,7 @@ class ButtonTriggerAnalyzer:
     def send_prompt(self, message):
         """Send message to ESP32 display"""
         try:
-            self.prompt_sock.sendto(message.encode(), (self.esp32_ip, self.prompt_port))
+            self.prompt_sock.sendto(message.encode(), self.prompt_addr)
             print(f"Sent to ESP32: {message[:50]}...")
         except Exception as e:
             print(f"Failed to send: {e}")
@@ -89,6 +128,15 @@ class ButtonTriggerAnalyzer:
         """Tell ESP32 to show waiting state"""
         self.send_prompt("WAITING")
     
+    def _append_capped(self, audio_buffer, data):
+        """Append audio to the buffer, stopping at MAX_RECORDING_BYTES"""
+        room = MAX_RECORDING_BYTES - len(audio_buffer)
+        if room <= 0:
+            return
+        audio_buffer.extend(data[:room])
+        if len(audio_buffer) == MAX_RECORDING_BYTES:
+            print(f"[Button Trigger] Recording limit reached ({MAX_RECORDING_SECONDS}s), ignoring further audio")
+    
     def receive_audio_until_stop(self):
         """Receive audio from ESP32 until STOP message received"""
         print("\n[Button Trigger] Receiving audio...")
@@ -96,27 +144,34 @@ class ButtonTriggerAnalyzer:
         audio_buffer = bytearray()
         recording_started = False
         start_time = time.time()
+        last_progress_time = start_time
         
         self.audio_sock.settimeout(5.0)  # 5 second socket timeout
         
         last_data_time = time.time()
         no_data_timeout = 10  # If no data for 10 seconds, consider recording done
         
+        # Receive every packet into one reused buffer instead of a new bytes object
+        packet = bytearray(4096)
+        packet_view = memoryview(packet)
+        
         while True:
             try:
-                data, addr = self.audio_sock.recvfrom(4096)
+                nbytes, addr = self.audio_sock.recvfrom_into(packet)
+                data = packet_view[:nbytes]
                 last_data_time = time.time()
                 
                 # Check for control messages
-                if len(data) < 100:
+                if nbytes < 100:
                     try:
-                        msg = data.decode('utf-8')
+                        msg = bytes(data).decode('utf-8')
                         
                         # START message - recording started
                         if msg.startswith("START"):
                             print("[Button Trigger] Recording started by ESP32")
                             recording_started = True
                             start_time = time.time()
+                            last_progress_time = start_time
                             continue
                         
                         # STOP message - recording stopped
@@ -131,17 +186,18 @@ class ButtonTriggerAnalyzer:
                 
                 # Audio data
                 if recording_started or len(audio_buffer) > 0:
-                    audio_buffer.extend(data)
+                    self._append_capped(audio_buffer, data)
                     if not recording_started:
                         recording_started = True
                         print("[Button Trigger] First audio data received...")
                 
-                # Progress update every 5 seconds
-                if recording_started:
-                    elapsed = time.time() - start_time
-                    if int(elapsed) % 5 == 0 and int(elapsed) > 0:
-                        received_sec = len(audio_buffer) / (44100 * 2 * 2)
-                        print(f"[Button Trigger] Progress: {elapsed:.1f}s elapsed, {received_sec:.1f}s audio received")
+                # Progress update every 5 seconds (once, not on every packet
+                # that arrives during that second)
+                if recording_started and last_data_time - last_progress_time >= 5:
+                    last_progress_time = last_data_time
+                    elapsed = last_data_time - start_time
+                    received_sec = len(audio_buffer) / BYTES_PER_SECOND
+                    print(f"[Button Trigger] Progress: {elapsed:.1f}s elapsed, {received_sec:.1f}s audio received")
                     
             except socket.timeout:
                 # Check if we've lost connection
@@ -153,7 +209,7 @@ class ButtonTriggerAnalyzer:
         
         self.audio_sock.settimeout(None)
         
-        duration_sec = len(audio_buffer) / (44100 * 2 * 2)  # 44100 Hz, 2 channels, 2 bytes
+        duration_sec = len(audio_buffer) / BYTES_PER_SECOND
         print(f"[Button Trigger] Received {len(audio_buffer)} bytes ({duration_sec:.2f}s)")
         
         return bytes(audio_buffer)
@@ -167,9 +223,9 @@ class ButtonTriggerAnalyzer:
         filepath = os.path.join(raw_dir, filename)
         
         with wave.open(filepath, 'wb') as wav:
-            wav.setnchannels(2)
-            wav.setsampwidth(2)
-            wav.setframerate(44100)
+            wav.setnchannels(CHANNELS)
+            wav.setsampwidth(SAMPLE_WIDTH)
+            wav.setframerate(SAMPLE_RATE)
             wav.writeframes(audio_data)
         
         return filepath
@@ -181,9 +237,9 @@ class ButtonTriggerAnalyzer:
         try:
             transcription = await self.dg_client.transcribe_audio_from_bytes_with_retry(
                 audio_data,
-                sample_rate=44100,
-                channels=2,
-                sample_width=2
+                sample_rate=SAMPLE_RATE,
+                channels=CHANNELS,
+                sample_width=SAMPLE_WIDTH
             )
             print(f"[Button Trigger] Transcription: {transcription}")
             return transcription
@@ -218,41 +274,13 @@ class ButtonTriggerAnalyzer:
     def generate_improvements(self, results):
         """Generate constructive improvement suggestions"""
         
-        # Extract scores with defaults
-        pron = results.get('pronunciation', 5)
-        artic = results.get('articulation', 5)
-        pace = results.get('pace', 5)
-        clarity = results.get('clarity', 5)
-        
         suggestions = []
-        
-        # Pronunciation feedback
-        if pron < 7:
-            if pron < 4:
-                suggestions.append("pronunciation needs work - slow down and articulate each word")
-            else:
-                suggestions.append("practice difficult words and focus on ending sounds")
-        
-        # Articulation feedback
-        if artic < 7:
-            if artic < 4:
-                suggestions.append("open your mouth more and exaggerate mouth movements")
-            else:
-                suggestions.append("work on consonant clarity - don't mumble word endings")
-        
-        # Pace feedback
-        if pace < 7:
-            if pace < 4:
-                suggestions.append("speak more steadily - avoid rushing through sentences")
-            else:
-                suggestions.append("use pauses between phrases - don't rush")
-        
-        # Clarity feedback
-        if clarity < 7:
-            if clarity < 4:
-                suggestions.append("speak louder and closer to the microphone")
-            else:
-                suggestions.append("project your voice and reduce filler words")
+        for aspect, weak_tip, fair_tip in IMPROVEMENT_TIPS:
+            score = results.get(aspect, 5)
+            if score < 4:
+                suggestions.append(weak_tip)
+            elif score < 7:
+                suggestions.append(fair_tip)
         
         if not suggestions:
             return "Good delivery. Minor refinements only."
@@ -265,8 +293,6 @@ class ButtonTriggerAnalyzer:
     
     def check_cam_status(self):
         """Check ESP32-CAM status to diagnose recording issues"""
-        import urllib.request
-        import json
         
         try:
             status_url = f"http://{self.cam_ip}/status"
@@ -280,8 +306,6 @@ class ButtonTriggerAnalyzer:
     
     def download_video_from_cam(self, output_dir="recordings/raw", max_retries=5):
         """Download recorded video from ESP32-CAM SD card with robust retry logic and OLED progress"""
-        import urllib.request
-        import os
         
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
@@ -463,26 +487,39 @@ class ButtonTriggerAnalyzer:
         
         try:
             with wave.open(wav_path, 'rb') as wav:
-                audio_data = wav.readframes(wav.getnframes())
-            
-            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            
-            # Send START
-            for _ in range(3):
-                sock.sendto(b"START", (self.esp32_ip, self.playback_port))
-                time.sleep(0.1)
-            
-            # Send audio in chunks
-            chunk_size = 1024
-            for i in range(0, len(audio_data), chunk_size):
-                chunk = audio_data[i:i+chunk_size]
-                sock.sendto(chunk, (self.esp32_ip, self.playback_port))
-                time.sleep(0.005)
-            
-            # Send END
-            for _ in range(5):
-                sock.sendto(b"END", (self.esp32_ip, self.playback_port))
-                time.sleep(0.1)
+                # Connect once so each send skips the per-packet address lookup
+                sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                sock.connect((self.esp32_ip, self.playback_port))
+                send = sock.send
+                
+                # Send START
+                for _ in range(3):
+                    send(b"START")
+                    time.sleep(0.1)
+                
+                # Stream audio from the file in chunks, paced against an absolute
+                # deadline so sleep overshoot doesn't accumulate over long recordings.
+                # After a stall the deadline restarts, so a late wakeup costs at most
+                # one extra packet instead of a burst the ESP32 can't buffer
+                chunk_size = 1024
+                chunk_frames = chunk_size // (wav.getnchannels() * wav.getsampwidth())
+                chunk_interval = chunk_frames / wav.getframerate()  # playback time per chunk
+                deadline = time.monotonic()
+                chunk = wav.readframes(chunk_frames)
+                while chunk:
+                    send(chunk)
+                    deadline += chunk_interval
+                    remaining = deadline - time.monotonic()
+                    if remaining > 0:
+                        time.sleep(remaining)
+                    elif remaining < -chunk_interval:
+                        deadline = time.monotonic()
+                    chunk = wav.readframes(chunk_frames)
+                
+                # Send END
+                for _ in range(5):
+                    send(b"END")
+                    time.sleep(0.1)
             
             sock.close()
             print("[Button Trigger] Playback sent")
@@ -501,7 +538,6 @@ class ButtonTriggerAnalyzer:
     
     def send_audio_to_cam(self, wav_path, filename="playback.wav"):
         """Send audio file to ESP32-CAM for storage on SD card"""
-        import urllib.request
         
         print(f"\n[Option 3] Sending audio to CAM SD card: {filename}")
         
@@ -533,7 +569,6 @@ class ButtonTriggerAnalyzer:
     
     def play_audio_from_cam(self):
         """Trigger ESP32-CAM to stream audio via ESP-NOW to main ESP32"""
-        import urllib.request
         
         print("\n[Option 3] Triggering playback from CAM via ESP-NOW...")
         
@@ -561,14 +596,16 @@ class ButtonTriggerAnalyzer:
             self.send_show_prompts()
             return None
         
-        # Save recording
+        # Save recording on a worker thread so the WAV write overlaps transcription
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"button_trigger_{timestamp}.wav"
-        wav_path = self.save_audio(audio_data, filename)
-        print(f"[Button Trigger] Saved: {filename}")
+        loop = asyncio.get_running_loop()
+        save_future = loop.run_in_executor(None, self.save_audio, audio_data, filename)
         
         # Transcribe
         transcription = await self.transcribe(audio_data)
+        wav_path = await save_future
+        print(f"[Button Trigger] Saved: {filename}")
         if not transcription:
             print("[Button Trigger] No transcription, skipping analysis")
             self.send_show_prompts()
@@ -587,7 +624,7 @@ class ButtonTriggerAnalyzer:
                 detailed_scores += f"|{short_name}:{score:.0f}"
         score_msg = f"SCORE:{detailed_scores}"
         self.send_prompt(score_msg)
-        time.sleep(5)
+        await asyncio.sleep(5)
         
         # Send improvements
         improvements = self.generate_improvements(results)
@@ -596,7 +633,7 @@ class ButtonTriggerAnalyzer:
         
         # Wait for ESP32 to finish displaying feedback (5s) + setup time (1s)
         print("[Button Trigger] Waiting for feedback display...")
-        time.sleep(6)
+        await asyncio.sleep(6)
         
         # Send playback
         self.send_playback(wav_path)
@@ -606,8 +643,6 @@ class ButtonTriggerAnalyzer:
     
     def combine_audio_video(self, audio_path, video_path, output_path=None):
         """Combine audio (WAV) and video (MP4) into a single MP4 file using ffmpeg"""
-        import subprocess
-        import os
         
         if not audio_path or not os.path.exists(audio_path):
             print("[Combine] Audio file not found")
@@ -683,13 +718,18 @@ class ButtonTriggerAnalyzer:
                 audio_buffer = bytearray()
                 recording_started = False
                 
+                # Receive every packet into one reused buffer instead of a new bytes object
+                packet = bytearray(4096)
+                packet_view = memoryview(packet)
+                
                 while True:
-                    data, addr = self.audio_sock.recvfrom(4096)
+                    nbytes, addr = self.audio_sock.recvfrom_into(packet)
+                    data = packet_view[:nbytes]
                     
                     # Check for control messages
-                    if len(data) < 100:
+                    if nbytes < 100:
                         try:
-                            msg = data.decode('utf-8')
+                            msg = bytes(data).decode('utf-8')
                             
                             # START message
                             if msg.startswith("START"):
@@ -709,7 +749,7 @@ class ButtonTriggerAnalyzer:
                     
                     # Audio data
                     if recording_started:
-                        audio_buffer.extend(data)
+                        self._append_capped(audio_buffer, data)
                 
                 # Process the recording
                 if len(audio_buffer) > 0:
@@ -717,7 +757,7 @@ class ButtonTriggerAnalyzer:
                     
                     # Wait for camera to finish writing file
                     print("\n[Video] Waiting for camera to finalize recording...")
-                    time.sleep(2)
+                    await asyncio.sleep(2)
                     
                     # Download video from ESP32-CAM SD card after audio processing
                     print("[Video] Retrieving video from ESP32-CAM...")
@@ -741,7 +781,7 @@ class ButtonTriggerAnalyzer:
                 
             except Exception as e:
                 print(f"[Button Trigger] Error: {e}")
-                time.sleep(1)
+                await asyncio.sleep(1)
 
 async def main():
     analyzer = ButtonTriggerAnalyzer()
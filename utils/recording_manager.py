@@ -3,6 +3,8 @@ Module for managing audio recordings: saving, listing, and playing back
 """
 import os
 import glob
+import json
+import wave
 import pygame
 import time
 from datetime import datetime
@@ -37,7 +39,6 @@ class RecordingManager:
         
         # If audio_params are provided, create a proper WAV file
         if audio_params:
-            import wave
             with wave.open(filepath, 'wb') as wav_file:
                 wav_file.setnchannels(audio_params.get('channels', 1))
                 wav_file.setsampwidth(audio_params.get('sample_width', 2))
@@ -50,7 +51,6 @@ class RecordingManager:
         
         # Save analysis results to a companion JSON file
         if analysis_results is not None:
-            import json
             json_filepath = filepath.replace('.wav', '.json')
             with open(json_filepath, 'w') as f:
                 json.dump({
@@ -84,13 +84,13 @@ class RecordingManager:
         :return: Dictionary with recording info
         """
         filename = os.path.basename(filepath)
-        size = os.path.getsize(filepath)
-        mod_time = datetime.fromtimestamp(os.path.getmtime(filepath))
+        stat = os.stat(filepath)
+        mod_time = datetime.fromtimestamp(stat.st_mtime)
         
         return {
             'filename': filename,
             'filepath': filepath,
-            'size': size,
+            'size': stat.st_size,
             'modified': mod_time.strftime("%Y-%m-%d %H:%M:%S")
         }
     
@@ -104,7 +104,6 @@ class RecordingManager:
         
         # Check if the file is a valid WAV file before attempting to play
         try:
-            import wave
             with wave.open(filepath, 'rb') as wav_file:
                 # If this succeeds, it's a valid WAV file
                 params = wav_file.getparams()